@@ -9,7 +9,7 @@ import sys
 import re
 import os
 from os import path
-from itertools import islice
+from functools import lru_cache
 
 re_funcptr = re.compile(r"^typedef (.+) \(VKAPI_PTR \*$")
 re_single_const = re.compile(r"^const\s+(.+)\*\s*$")
@@ -17,6 +17,8 @@ re_double_const = re.compile(r"^const\s+(.+)\*\s+const\*\s*$")
 re_array = re.compile(r"^([^\[]+)\[(\d+)\]$")
 re_camel_case = re.compile(r"([a-z])([A-Z])")
 re_long_int = re.compile(r"([0-9]+)ULL")
+re_expand_name = re.compile(r"([0-9a-z_])([A-Z0-9][^A-Z0-9]?)")
+re_expand_suffix = re.compile(r"[A-Z][A-Z]+$")
 
 if len(sys.argv) > 2 and not sys.argv[2].startswith( "--" ):
 	sys.path.append(sys.argv[1] + "/src/spec/")
@@ -29,6 +31,16 @@ except ImportError as e:
 	print("-----", file=sys.stderr)
 	raise
 
+# prefer the libxml2 backed parser, vk.xml is large enough for it to matter
+# the registry keeps references into the whole tree so it can not be streamed,
+# but comment nodes are never read and do not need to be kept in memory
+try:
+	from lxml import etree as xmlparser
+	XML_PARSER = xmlparser.XMLParser(remove_comments=True)
+except ImportError:
+	import xml.etree.ElementTree as xmlparser
+	XML_PARSER = None # ElementTree already skips comments
+
 PACKAGE_HEADER = """\
 module {PACKAGE_PREFIX};
 public import {PACKAGE_PREFIX}.types;
@@ -81,38 +93,79 @@ public import {PACKAGE_PREFIX}.types;
 extern(System) @nogc nothrow {{\
 """
 
-def getFullType(elem, opaqueStruct = None):
-	typ = elem.find("type")
+# global level function pointers are set in the loadGlobalLevelFunctions method written in endFile
+GLOBAL_LEVEL_FUNC_NAMES = frozenset({"vkGetInstanceProcAddr", "vkEnumerateInstanceExtensionProperties", "vkEnumerateInstanceLayerProperties", "vkCreateInstance"})
+
+def getFullTypeAndName(elem, opaqueStruct = None):
+	"""
+	Returns the full type and the name of a member, param or proto element
+	"""
+	# pick up the child elements in a single pass over them
+	typ = arrlen = name = None
+	for child in elem:
+		if child.tag == "type":
+			typ = child
+		elif child.tag == "name":
+			name = child
+		elif child.tag == "enum":
+			arrlen = child
+
 	typstr = (elem.text or "").lstrip() + typ.text.strip() + (typ.tail or "").rstrip()
 
 	# catch opaque structs
-	if typstr.startswith('struct'):
-		typstr = typstr.lstrip('struct ')
-		if isinstance(opaqueStruct, set):
+	if typstr.startswith('struct '):
+		typstr = typstr[7:]
+		if opaqueStruct is not None:
 			opaqueStruct.add(typstr.rstrip('*'))
 	
-	arrlen = elem.find("enum")
 	if arrlen is not None:
-		return "{0}[{1}]".format(typstr, arrlen.text)
+		return "{0}[{1}]".format(typstr, arrlen.text), name.text
 	else:
-		name = elem.find("name")
-		return typstr + (name.tail or "")
+		return typstr + (name.tail or ""), name.text
+
+def getFullType(elem, opaqueStruct = None):
+	return getFullTypeAndName(elem, opaqueStruct)[0]
+
+@lru_cache(maxsize=None)
+def structTypeEnumName(name):
+	"""
+	Derives the VK_STRUCTURE_TYPE_* enumerant suffix from a struct name
+	"""
+	return re_camel_case.sub(r"\1_\2", name[2:]).upper()
 
+@lru_cache(maxsize=None)
+def expandGroupName(groupName):
+	"""
+	Splits an enum group name into the prefix and suffix used for its range enumerants
+	"""
+	expandName = re_expand_name.sub(r'\1_\2', groupName).upper()
+
+	expandPrefix = expandName
+	expandSuffix = ''
+	expandSuffixMatch = re_expand_suffix.search(groupName)
+	if expandSuffixMatch:
+		expandSuffix = '_' + expandSuffixMatch.group()
+		# Strip off the suffix from the prefix
+		expandPrefix = expandName.rsplit(expandSuffix, 1)[0]
+	return expandPrefix, expandSuffix
+
+@lru_cache(maxsize=1024)
 def convertTypeConst(typ):
 	"""
 	Converts C const syntax to D const syntax
 	"""
-	doubleConstMatch = re.match(re_double_const, typ)
+	doubleConstMatch = re_double_const.match(typ)
 	if doubleConstMatch:
 		return "const({0}*)*".format(doubleConstMatch.group(1))
 	else:
-		singleConstMatch = re.match(re_single_const, typ)
+		singleConstMatch = re_single_const.match(typ)
 		if singleConstMatch:
 			return "const({0})*".format(singleConstMatch.group(1))
 	return typ
 
+@lru_cache(maxsize=1024)
 def convertTypeArray(typ, name):
-	arrMatch = re.match(re_array, name)
+	arrMatch = re_array.match(name)
 	if arrMatch:
 		return "{0}[{1}]".format(typ, arrMatch.group(2)), arrMatch.group(1)
 	else:
@@ -125,13 +178,22 @@ class DGenerator(OutputGenerator):
 	def __init__(self, errFile=sys.stderr, warnFile=sys.stderr, diagFile=sys.stderr):
 		super().__init__(errFile, warnFile, diagFile)
 		self.instanceLevelFuncNames = set()
-		self.instanceLevelFunctions = ""
+		self.instanceLevelFunctions = []
 		self.deviceLevelFuncNames = set()
-		self.deviceLevelFunctions = ""
-		self.sections = dict([(section, []) for section in self.ALL_SECTIONS])
-		self.functionTypeName = dict()
-		self.functionVars = ""
+		self.deviceLevelFunctions = []
+		self.sections = {section: [] for section in self.ALL_SECTIONS}
+		self.functionVars = []
 		self.opaqueStruct = set()
+		self.structTypeEnums = dict()
+		# type categories handled by genType, all others are skipped
+		self.typeGenerators = {
+			"handle"      : self.genHandle,
+			"basetype"    : self.genBasetype,
+			"bitmask"     : self.genBitmask,
+			"funcpointer" : self.genFuncpointer,
+			"struct"      : self.genStruct,
+			"union"       : self.genStruct,
+		}
 		self.surfaceExtensions = {
 			"// VK_KHR_android_surface" : ["VK_USE_PLATFORM_ANDROID_KHR",	"public import android.native_window;\n"],
 			"// VK_KHR_mir_surface"     : ["VK_USE_PLATFORM_MIR_KHR",		"public import mir_toolkit.client_types;\n"],
@@ -143,15 +205,12 @@ class DGenerator(OutputGenerator):
 
 	def beginFile(self, genOpts):
 		self.genOpts = genOpts
-		try:
-			os.mkdir(genOpts.filename)
-		except FileExistsError:
-			pass
+		self.addExtensions = re.compile(genOpts.addExtensions) if genOpts.addExtensions is not None else None
+		os.makedirs(genOpts.filename, exist_ok=True)
 		
-		self.typesFile = open(path.join(genOpts.filename, "types.d"), "w", encoding="utf-8")
-		self.funcsFile = open(path.join(genOpts.filename, "functions.d"), "w", encoding="utf-8")
-
-		self.testsFile = open(path.join(genOpts.filename, "test.txt"), "w", encoding="utf-8")
+		# types.d and functions.d receive one large write per feature, use a bigger buffer for them
+		self.typesFile = open(path.join(genOpts.filename, "types.d"), "w", encoding="utf-8", buffering=131072)
+		self.funcsFile = open(path.join(genOpts.filename, "functions.d"), "w", encoding="utf-8", buffering=131072)
 		
 		with open(path.join(genOpts.filename, "package.d"), "w", encoding="utf-8") as packageFile:
 			write(PACKAGE_HEADER.format(PACKAGE_PREFIX = genOpts.packagePrefix), file=packageFile)
@@ -160,7 +219,9 @@ class DGenerator(OutputGenerator):
 		write(FUNCTIONS_HEADER.format(PACKAGE_PREFIX = genOpts.packagePrefix), file=self.funcsFile)
 	
 	def endFile(self):
-		write("}}\n\n__gshared {{{0}\n}}\n".format(self.functionVars), file=self.funcsFile)
+		# device level loaders are emitted twice, once for VkInstance and once for VkDevice
+		deviceLevelFunctions = "".join(self.deviceLevelFunctions)
+		write("}}\n\n__gshared {{{0}\n}}\n".format("".join(self.functionVars)), file=self.funcsFile)
 		write("""\
 struct {NAME_PREFIX}Loader {{
 	@disable this();
@@ -179,7 +240,7 @@ struct {NAME_PREFIX}Loader {{
 	static void loadInstanceLevelFunctions(VkInstance instance) {{
 		assert(vkGetInstanceProcAddr !is null, "Must call {NAME_PREFIX}Loader.loadGlobalLevelFunctions before {NAME_PREFIX}Loader.loadInstanceLevelFunctions");\
 """.format(NAME_PREFIX = self.genOpts.namePrefix) +
-		self.instanceLevelFunctions, file=self.funcsFile)
+		"".join(self.instanceLevelFunctions), file=self.funcsFile)
 		write("""\
 	}}
 
@@ -188,7 +249,7 @@ struct {NAME_PREFIX}Loader {{
 	static void loadDeviceLevelFunctions(VkInstance instance) {{
 		assert(vkGetInstanceProcAddr !is null, "Must call {NAME_PREFIX}Loader.loadInstanceLevelFunctions before {NAME_PREFIX}Loader.loadDeviceLevelFunctions");\
 """.format(NAME_PREFIX = self.genOpts.namePrefix) +
-		self.deviceLevelFunctions.format(INSTANCE_OR_DEVICE = "Instance", instance_or_device = "instance"), file=self.funcsFile)
+		deviceLevelFunctions.format(INSTANCE_OR_DEVICE = "Instance", instance_or_device = "instance"), file=self.funcsFile)
 		write("""\
 	}}
 
@@ -197,7 +258,7 @@ struct {NAME_PREFIX}Loader {{
 	static void loadDeviceLevelFunctions(VkDevice device) {{
 		assert(vkGetDeviceProcAddr !is null, "Must call {NAME_PREFIX}Loader.loadInstanceLevelFunctions before {NAME_PREFIX}Loader.loadDeviceLevelFunctions");\
 """.format(NAME_PREFIX = self.genOpts.namePrefix) +
-		self.deviceLevelFunctions.format(INSTANCE_OR_DEVICE = "Device", instance_or_device = "device"), file=self.funcsFile)
+		deviceLevelFunctions.format(INSTANCE_OR_DEVICE = "Device", instance_or_device = "device"), file=self.funcsFile)
 		write("""\
 	}}
 }}
@@ -240,7 +301,8 @@ version({NAME_PREFIX}LoadFromDerelict) {{
 	def beginFeature(self, interface, emit):
 		OutputGenerator.beginFeature(self, interface, emit)
 		self.currentFeature = "// {0}".format(interface.attrib['name'])
-		self.sections = dict([(section, []) for section in self.ALL_SECTIONS])
+		for contents in self.sections.values():
+			contents.clear()
 		self.opaqueStruct.clear()
 		self.surfaceExtensionVersionIndent = ""
 		self.isSurfaceExtension = self.currentFeature in self.surfaceExtensions
@@ -249,14 +311,24 @@ version({NAME_PREFIX}LoadFromDerelict) {{
 
 	def endFeature(self):
 		if self.emit:
+			# collect the output lines and write them in one go at the end
+			typesLines = []
+			funcsLines = []
+
 			# write all types into types.d
 			extIndent = self.surfaceExtensionVersionIndent
-			#write(self.currentFeature, file=self.testsFile)
-			write("\n" + self.currentFeature, file=self.typesFile)
-			surfaceVersion = ""
+
+			# surface extensions are wrapped into a version block, for all other features these are empty
 			if self.isSurfaceExtension:
-				surfaceVersion = "version( {0} ) {{".format(self.surfaceExtensions[self.currentFeature][0])
-				write("{0}\n\t{1}".format(surfaceVersion, self.surfaceExtensions[self.currentFeature][1]), file=self.typesFile)
+				platform, platformImport = self.surfaceExtensions[self.currentFeature]
+				versionOpen = [f"version( {platform} ) {{"]
+				versionClose = ["}"]
+				typesOpen = versionOpen + ["\t" + platformImport]
+			else:
+				versionOpen, versionClose, typesOpen = [], [], []
+
+			typesLines.append("\n" + self.currentFeature)
+			typesLines.extend(typesOpen)
 
 			for section in self.TYPE_SECTIONS:
 				# write contents of type section
@@ -265,23 +337,22 @@ version({NAME_PREFIX}LoadFromDerelict) {{
 					# check if opaque structs were registered and write tem into types file	
 					if section == 'struct' and self.opaqueStruct:
 						for opaque in self.opaqueStruct:
-							write("{1}struct {0};".format(opaque, extIndent), file=self.typesFile)
-						write('', file=self.typesFile)
+							typesLines.append(f"{extIndent}struct {opaque};")
+						typesLines.append('')
 
 					# write the rest of the contents, eg. enums, structs, etc. into types file
 					for content in self.sections[section]:
-						write("{1}{0}".format(content, extIndent), file=self.typesFile)
+						typesLines.append(f"{extIndent}{content}")
 					#write('', file=self.typesFile)
 
-			if self.isSurfaceExtension:
-				write("}", file=self.typesFile)
+			typesLines.extend(versionClose)
 
 			# currently the commandPointer token is not used
 			if self.genOpts.genFuncPointers and self.sections['commandPointer']:
-				if self.isSurfaceExtension: write(surfaceVersion, file=self.funcsFile)
-				write(extIndent + ('\n' + extIndent).join(self.sections['commandPointer']), file=self.funcsFile)
-				if self.isSurfaceExtension: write("}", file=self.funcsFile)
-				write('', file=self.funcsFile)
+				funcsLines.extend(versionOpen)
+				funcsLines.append(extIndent + ('\n' + extIndent).join(self.sections['commandPointer']))
+				funcsLines.extend(versionClose)
+				funcsLines.append('')
 
 			# update indention of currentFeature
 			self.currentFeature = "\t" + self.currentFeature;
@@ -289,25 +360,24 @@ version({NAME_PREFIX}LoadFromDerelict) {{
 			# write function aliases into functions.d and build strings for later injection
 			if self.sections['command']:
 				# write the aliases to function types
-				write("\n{0}".format(self.currentFeature), file=self.funcsFile)
-				if self.isSurfaceExtension: write("\t" + surfaceVersion, file=self.funcsFile)
-				write(extIndent + ('\n' + extIndent).join(self.sections['command']), file=self.funcsFile)
-				if self.isSurfaceExtension: write("\t}", file=self.funcsFile)
+				funcsLines.append(f"\n{self.currentFeature}")
+				funcsLines.extend("\t" + line for line in versionOpen)
+				funcsLines.append(extIndent + ('\n' + extIndent).join(funTypeName for funTypeName, _ in self.sections['command']))
+				funcsLines.extend("\t" + line for line in versionClose)
 
 				# capture if function is a instance or device level function
 				inInstanceLevelFuncNames = False
 				inDeviceLevelFuncNames = False
 
 				# comment the current feature
-				self.functionVars += "\n\n{0}".format(self.currentFeature)
+				self.functionVars.append(f"\n\n{self.currentFeature}")
 
 				# surface extension version directive
-				if self.isSurfaceExtension: self.functionVars += "\n\t" + surfaceVersion
+				self.functionVars.extend("\n\t" + line for line in versionOpen)
 
 				# create string of functionTypes functionVars
-				for command in self.sections['command']:
-					name = self.functionTypeName[command]
-					self.functionVars += "\n\t{1}PFN_{0} {0};".format(name, extIndent)
+				for _, name in self.sections['command']:
+					self.functionVars.append(f"\n\t{extIndent}PFN_{name} {name};")
 
 					# query if the current function is in instance or deviceLevelFuncNames for the next step
 					if not inInstanceLevelFuncNames and name in self.instanceLevelFuncNames:
@@ -317,44 +387,43 @@ version({NAME_PREFIX}LoadFromDerelict) {{
 						inDeviceLevelFuncNames = True
 
 				# surface extension version closing curly brace
-				if self.isSurfaceExtension: self.functionVars += "\n\t}"
+				self.functionVars.extend("\n\t" + line for line in versionClose)
 
 				# create a strings to load instance level functions
 				if inInstanceLevelFuncNames:
 					# comment the current feature
-					self.instanceLevelFunctions += "\n\n\t{0}".format(self.currentFeature)
+					self.instanceLevelFunctions.append(f"\n\n\t{self.currentFeature}")
 
 					# surface extension version directive
-					if self.isSurfaceExtension: self.instanceLevelFunctions += "\n\t\t" + surfaceVersion
-					
-					# set of global level function names, function pointers are ignored here are set in endFile method
-					gloablLevelFuncNames = {"vkGetInstanceProcAddr", "vkEnumerateInstanceExtensionProperties", "vkEnumerateInstanceLayerProperties", "vkCreateInstance"}
+					self.instanceLevelFunctions.extend("\n\t\t" + line for line in versionOpen)
 
 					# build the commands
-					for command in self.sections['command']:
-						name = self.functionTypeName[command]
-						if name in self.instanceLevelFuncNames and name not in gloablLevelFuncNames:
-							self.instanceLevelFunctions += "\n\t\t{1}{0} = cast(typeof({0})) vkGetInstanceProcAddr(instance, \"{0}\");".format(name, extIndent)
+					for _, name in self.sections['command']:
+						if name in self.instanceLevelFuncNames and name not in GLOBAL_LEVEL_FUNC_NAMES:
+							self.instanceLevelFunctions.append(f"\n\t\t{extIndent}{name} = cast(typeof({name})) vkGetInstanceProcAddr(instance, \"{name}\");")
 
 					# surface extension version closing curly brace
-					if self.isSurfaceExtension: self.instanceLevelFunctions += "\n\t\t}"
+					self.instanceLevelFunctions.extend("\n\t\t" + line for line in versionClose)
 
 				# create a strings to load device level functions
 				if inDeviceLevelFuncNames:
 					# comment the current feature
-					self.deviceLevelFunctions += "\n\n\t{0}".format(self.currentFeature)
+					self.deviceLevelFunctions.append(f"\n\n\t{self.currentFeature}")
 
 					# surface extension version directive
-					if self.isSurfaceExtension: self.deviceLevelFunctions += "\n\t\t" + surfaceVersion
+					self.deviceLevelFunctions.extend("\n\t\t" + line for line in versionOpen)
 
 					# build the commands
-					for command in self.sections['command']:
-						name = self.functionTypeName[command]
+					for _, name in self.sections['command']:
 						if name in self.deviceLevelFuncNames:
-							self.deviceLevelFunctions += "\n\t\t{1}{0} = cast(typeof({0})) vkGet{{INSTANCE_OR_DEVICE}}ProcAddr({{instance_or_device}}, \"{0}\");".format(name, extIndent)
+							self.deviceLevelFunctions.append(f"\n\t\t{extIndent}{name} = cast(typeof({name})) vkGet{{INSTANCE_OR_DEVICE}}ProcAddr({{instance_or_device}}, \"{name}\");")
 					
 					# surface extension version closing curly brace
-					if self.isSurfaceExtension: self.deviceLevelFunctions += "\n\t\t}"	
+					self.deviceLevelFunctions.extend("\n\t\t" + line for line in versionClose)
+
+			write("\n".join(typesLines), file=self.typesFile)
+			if funcsLines:
+				write("\n".join(funcsLines), file=self.funcsFile)
 
 		# Finish processing in superclass
 		OutputGenerator.endFeature(self)
@@ -372,66 +441,59 @@ version({NAME_PREFIX}LoadFromDerelict) {{
 			elif required == "vk_platform":
 				return
 
-		category = typeinfo.elem.attrib["category"]
+		handler = self.typeGenerators.get(typeinfo.elem.attrib["category"])
+		if handler:
+			handler(typeinfo, name)
 
-		if category == "handle":
-			self.appendSection("handle", "mixin({0}!q{{{1}}});".format(typeinfo.elem.find("type").text, name))
-			
-		elif category == "basetype":
-			self.appendSection("basetype", "alias {0} = {1};".format(name, typeinfo.elem.find("type").text))
-			
-		elif category == "bitmask":
-			self.appendSection("bitmask", "alias {0} = VkFlags;".format(name))
-			
-		elif category == "funcpointer":
-			returnType = re.match(re_funcptr, typeinfo.elem.text).group(1)
-			params = "".join(islice(typeinfo.elem.itertext(), 2, None))[2:]
-			if params == "void);" : params = ");"
-			self.appendSection("funcpointer", "alias {0} = {1} function({2}".format(name, returnType, params))
-			
-		elif category == "struct" or category == "union":
-			self.genStruct(typeinfo, name)
+	def genHandle(self, typeinfo, name):
+		self.appendSection("handle", "mixin({0}!q{{{1}}});".format(typeinfo.elem.find("type").text, name))
+
+	def genBasetype(self, typeinfo, name):
+		self.appendSection("basetype", "alias {0} = {1};".format(name, typeinfo.elem.find("type").text))
+
+	def genBitmask(self, typeinfo, name):
+		self.appendSection("bitmask", "alias {0} = VkFlags;".format(name))
+
+	def genFuncpointer(self, typeinfo, name):
+		returnType = re_funcptr.match(typeinfo.elem.text).group(1)
+		# the parameters start after the ")(" following <name>, the <type> elements hold their types
+		nameElem, *paramTypes = typeinfo.elem
+		params = nameElem.tail[2:] + "".join(typ.text + (typ.tail or "") for typ in paramTypes)
+		if params == "void);" : params = ");"
+		self.appendSection("funcpointer", "alias {0} = {1} function({2}".format(name, returnType, params))
 
-		else:
-			pass
-		
 	def genStruct(self, typeinfo, name):
 		super().genStruct(typeinfo, name)
 		category = typeinfo.elem.attrib["category"]
-		self.appendSection("struct", "\n{2}{0} {1} {{".format(category, name, self.surfaceExtensionVersionIndent))
-		targetLen = 0
 		memberTypeName = []
 
 		for member in typeinfo.elem.findall("member"):
-			memberType = convertTypeConst(getFullType(member, self.opaqueStruct).strip())
-			memberName = member.find("name").text
+			memberType, memberName = getFullTypeAndName(member, self.opaqueStruct)
+			memberType = convertTypeConst(memberType.strip())
 			if memberName == "module":
 				# don't use D identifiers
 				memberName = "_module"
 			
-			# get tha maximum string length of all member types
 			memberType, memberName = convertTypeArray(memberType, memberName)
 			memberTypeName.append((memberType, memberName))
-			targetLen = max(targetLen, len(memberType))
 
-		# loop second time and use maximum type string length to offset member names
-		isVkWin32SurfaceCreateInfoKHR = name == "VkWin32SurfaceCreateInfoKHR" # get this query out of the loop bellow
-		for type_name in memberTypeName:
-			memberType = type_name[0]
-			memberName = type_name[1]
+		# use maximum type string length to offset member names
+		targetLen = max((len(memberType) for memberType, _ in memberTypeName), default=0)
+		lines = ["\n{2}{0} {1} {{".format(category, name, self.surfaceExtensionVersionIndent)]
+		for memberType, memberName in memberTypeName:
 			if memberName == "sType" and memberType == "VkStructureType":
-				if isVkWin32SurfaceCreateInfoKHR:	# the name transformation bellow does not work for this struct
-					structType = "\t{0} sType = VkStructureType.VK_STRUCTURE_TYPE_{1};".format("VkStructureType".ljust(targetLen+1), "WIN32_SURFACE_CREATE_INFO_KHR")
-					self.appendSection("struct", structType)
-				else:
-					enumName = re.sub(re_camel_case, "\g<1>_\g<2>", name[2:]).upper()
-					structType = "\t{0}  sType = VkStructureType.VK_STRUCTURE_TYPE_{1};".format("VkStructureType".ljust(targetLen), enumName)
-					self.appendSection("struct", structType)
-				#write(name + " : " + enumName, file=self.testsFile)
+				# look up the sType enumerant by struct name, the camel case transformation
+				# does not work for every struct (eg. VkWin32SurfaceCreateInfoKHR)
+				enumName = self.structTypeEnums.get(name[2:].upper())
+				if enumName is None:
+					enumName = structTypeEnumName(name)
+				lines.append("\t{0}  sType = VkStructureType.VK_STRUCTURE_TYPE_{1};".format("VkStructureType".ljust(targetLen), enumName))
 			else:
-				self.appendSection("struct", "\t{0}  {1};".format(memberType.ljust(targetLen), memberName))
+				lines.append("\t{0}  {1};".format(memberType.ljust(targetLen), memberName))
+		lines.append("}")
 
-		self.appendSection("struct", "}")
+		# endFeature only indents the first line of a section entry
+		self.appendSection("struct", ("\n" + self.surfaceExtensionVersionIndent).join(lines))
 
 	
 	def genGroup(self, groupinfo, groupName):
@@ -440,15 +502,13 @@ version({NAME_PREFIX}LoadFromDerelict) {{
 
 		groupElem = groupinfo.elem
 
-		expandName = re.sub(r'([0-9a-z_])([A-Z0-9][^A-Z0-9]?)', r'\1_\2', groupName).upper()
+		expandPrefix, expandSuffix = expandGroupName(groupName)
 
-		expandPrefix = expandName
-		expandSuffix = ''
-		expandSuffixMatch = re.search(r'[A-Z][A-Z]+$', groupName)
-		if expandSuffixMatch:
-			expandSuffix = '_' + expandSuffixMatch.group()
-			# Strip off the suffix from the prefix
-			expandPrefix = expandName.rsplit(expandSuffix, 1)[0]
+		if groupName == "VkStructureType":
+			# map struct names without the Vk prefix and underscores to their sType enumerant, see genStruct
+			for elem in groupElem.findall('enum'):
+				enumName = elem.get('name')[len("VK_STRUCTURE_TYPE_"):]
+				self.structTypeEnums[enumName.replace('_', '')] = enumName
 
 		# Prefix
 		body = "\nenum " + groupName + " {\n"
@@ -464,21 +524,29 @@ version({NAME_PREFIX}LoadFromDerelict) {{
 		# by looking for 'extends' attributes.
 		minName = None
 		for elem in groupElem.findall('enum'):
+			name = elem.get('name')
+			extname = elem.get('extname')
+
+			# Extension enumerants are only included if they are requested
+			# in addExtensions or match defaultExtensions.
+			isIncluded = (extname is None or
+				(self.addExtensions is not None and self.addExtensions.match(extname) is not None) or
+				self.genOpts.defaultExtensions == elem.get('supported'))
+			isTracked = isEnum and elem.get('extends') is None
+			if not isIncluded and not isTracked:
+				# the value is not needed, skip parsing it
+				continue
+
 			# Convert the value to an integer and use that to track min/max.
 			# Values of form -(number) are accepted but nothing more complex.
 			# Should catch exceptions here for more complex constructs. Not yet.
 			(numVal, strVal) = self.enumToValue(elem, True)
-			name = elem.get('name')
 
-			# Extension enumerants are only included if they are requested
-			# in addExtensions or match defaultExtensions.
-			if (elem.get('extname') is None or
-				re.match(self.genOpts.addExtensions, elem.get('extname')) is not None or
-				self.genOpts.defaultExtensions == elem.get('supported')):
+			if isIncluded:
 				body += "\t" + name + " = " + strVal + ",\n"
 				globalEnums += "\tenum {0} = {1}.{0};\n".format(name, groupName)
 
-			if isEnum and elem.get('extends') is None:
+			if isTracked:
 				if minName is None:
 					minName = maxName = name
 					minValue = maxValue = numVal
@@ -512,7 +580,9 @@ version({NAME_PREFIX}LoadFromDerelict) {{
 		_,strVal = self.enumToValue(enuminfo.elem, False)
 		if strVal == "VK_STRUCTURE_TYPE_DEBUG_REPORT_CALLBACK_CREATE_INFO_EXT":
 			strVal = "VkStructureType." + strVal
-		strVal = re.sub(re_long_int, "\g<1>UL", strVal)
+		# only a few values carry the suffix, eg. VK_WHOLE_SIZE = (~0ULL)
+		if "ULL" in strVal:
+			strVal = re_long_int.sub(r"\1UL", strVal)
 		self.appendSection('enum', "enum {0} = {1};".format(name, strVal))
 		
 	def genCmd(self, cmdinfo, name):
@@ -520,12 +590,16 @@ version({NAME_PREFIX}LoadFromDerelict) {{
 		super().genCmd(cmdinfo, name)
 		proto = cmdinfo.elem.find("proto")
 		returnType = convertTypeConst(getFullType(proto).strip())
-		params = ", ".join(convertTypeConst(getFullType(param, self.opaqueStruct).strip()) + " " + param.find("name").text for param in cmdinfo.elem.findall("param"))
-		funTypeName = "\talias PFN_{0} = {1} function({2});".format(name, returnType, params)
-		self.appendSection('command', funTypeName)
-		self.functionTypeName[funTypeName] = name
-
 		params = cmdinfo.elem.findall("param")
+		paramStrs = []
+		paramStrsAppend = paramStrs.append
+		for param in params:
+			paramType, paramName = getFullTypeAndName(param, self.opaqueStruct)
+			paramStrsAppend(f"{convertTypeConst(paramType.strip())} {paramName}")
+		funTypeName = "\talias PFN_{0} = {1} function({2});".format(name, returnType, ", ".join(paramStrs))
+		# keep the command name next to its alias for endFeature
+		self.appendSection('command', (funTypeName, name))
+
 		if name != "vkGetDeviceProcAddr" and getFullType(params[0]) in {"VkDevice", "VkQueue", "VkCommandBuffer"}:
 			self.deviceLevelFuncNames.add(name)
 
@@ -557,7 +631,7 @@ if __name__ == "__main__":
 	
 	gen = DGenerator()
 	reg = Registry()
-	reg.loadElementTree(etree.parse(vkxml))
+	reg.loadElementTree(xmlparser.parse(vkxml, XML_PARSER))
 	reg.setGenerator(gen)
 	reg.apiGen(
 		DGeneratorOptions(